@@ -16,10 +16,11 @@
 #
 """Utility functions for file processing and message conversion."""
 
+import asyncio
 import json
 import os
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, ToolCall
 
@@ -27,6 +28,52 @@ from logger import logger
 from vector_store import VectorStore
 
 
+def _save_uploaded_file(
+    info: dict,
+    permanent_dir: str,
+    vector_store: VectorStore,
+    task_id: str
+) -> Optional[Tuple[str, str]]:
+    """Write one uploaded file to disk and register it as a source.
+
+    Args:
+        info: File dictionary with 'filename' and 'content' keys
+        permanent_dir: Directory the file is written into
+        vector_store: VectorStore instance used to register the source
+        task_id: Unique identifier for the processing task
+
+    Returns:
+        (file_path, file_name) of the saved file, or None if it could not be saved
+    """
+    try:
+        file_name = info["filename"]
+        content = info["content"]
+
+        file_path = os.path.join(permanent_dir, file_name)
+        with open(file_path, "wb") as f:
+            f.write(content)
+
+        # ====== Register source mapping for cleanup ======
+        vector_store.register_source(file_name, task_id)
+        # ================================================
+
+        logger.debug({
+            "message": "Saved file",
+            "task_id": task_id,
+            "filename": file_name,
+            "path": file_path
+        })
+        return file_path, file_name
+    except Exception as e:
+        logger.error({
+            "message": f"Error saving file {info['filename']}",
+            "task_id": task_id,
+            "filename": info['filename'],
+            "error": str(e)
+        }, exc_info=True)
+        return None
+
+
 async def process_and_ingest_files_background(
     file_info: List[dict], 
     vector_store: VectorStore, 
@@ -55,44 +102,24 @@ async def process_and_ingest_files_background(
         permanent_dir = os.path.join("uploads", task_id)
         os.makedirs(permanent_dir, exist_ok=True)
         
-        file_paths = []
-        file_names = []
-        
-        for info in file_info:
-            try:
-                file_name = info["filename"]
-                content = info["content"]
-
-                file_path = os.path.join(permanent_dir, file_name)
-                with open(file_path, "wb") as f:
-                    f.write(content)
-
-                file_paths.append(file_path)
-                file_names.append(file_name)
-
-                # ====== Register source mapping for cleanup ======
-                vector_store.register_source(file_name, task_id)
-                # ================================================
+        # Two uploads with the same filename would race on the same path, so
+        # keep only the last one, as the sequential loop effectively did
+        file_info = list({info["filename"]: info for info in file_info}.values())
 
-                logger.debug({
-                    "message": "Saved file",
-                    "task_id": task_id,
-                    "filename": file_name,
-                    "path": file_path
-                })
-            except Exception as e:
-                logger.error({
-                    "message": f"Error saving file {info['filename']}",
-                    "task_id": task_id,
-                    "filename": info['filename'],
-                    "error": str(e)
-                }, exc_info=True)
+        # Write files concurrently in worker threads so the event loop stays free
+        saved = await asyncio.gather(*(
+            asyncio.to_thread(_save_uploaded_file, info, permanent_dir, vector_store, task_id)
+            for info in file_info
+        ))
+        saved = [entry for entry in saved if entry is not None]
+        file_paths = [file_path for file_path, _ in saved]
+        file_names = [file_name for _, file_name in saved]
         
         indexing_tasks[task_id] = "loading_documents"
         logger.debug({"message": "Loading documents", "task_id": task_id})
         
         try:
-            documents = vector_store._load_documents(file_paths)
+            documents = await asyncio.to_thread(vector_store._load_documents, file_paths)
             
             logger.debug({
                 "message": "Documents loaded, starting indexing",
@@ -101,7 +128,7 @@ async def process_and_ingest_files_background(
             })
             
             indexing_tasks[task_id] = "indexing_documents"
-            vector_store.index_documents(documents)
+            await asyncio.to_thread(vector_store.index_documents, documents)
             
             if file_names:
                 config = config_manager.read_config()
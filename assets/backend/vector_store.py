@@ -14,12 +14,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import asyncio
+import fcntl
 import glob
+import hashlib
 import json
+import random
+import threading
+import time
 import uuid
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 import os
 import shutil
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, partial
+import numpy as np
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_milvus import Milvus
 from langchain_core.documents import Document
@@ -29,29 +40,248 @@ from langchain_unstructured import UnstructuredLoader
 from dotenv import load_dotenv
 from logger import logger
 from typing import Optional, Callable
-import requests
+import httpx
+
+
+# Upload directory shared by every store built via the factory
+_UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+
+
+@lru_cache(maxsize=128)
+def _source_filter_expr(sources: Tuple[str, ...]) -> str:
+    """Build a Milvus `in` filter expression matching any of the given sources.
+
+    json.dumps produces correctly quoted and escaped string literals, and the
+    result is cached since the selected sources rarely change between queries.
+    """
+    return f"source in {json.dumps(list(sources), ensure_ascii=False)}"
+
+
+# Templated filter for deletes; the source list travels as expr_params so
+# Milvus binds the values instead of parsing them out of the expression
+_SOURCE_IN_TEMPLATE = "source in {sources}"
+
+
+def _extract_pdf_text(file_path: str) -> str:
+    """Extract the text of a PDF page by page with PyPDF."""
+    logger.info("Attempting PyPDF text extraction fallback")
+    try:
+        from pypdf import PdfReader
+        reader = PdfReader(file_path)
+        extracted_pages = []
+        for page in reader.pages:
+            try:
+                extracted_pages.append(page.extract_text() or "")
+            except Exception as per_page_err:
+                logger.info(f"Warning: failed to extract a page: {per_page_err}")
+                extracted_pages.append("")
+        return "\n\n".join(extracted_pages).strip()
+    except Exception as pypdf_error:
+        logger.info(f"PyPDF fallback failed: {pypdf_error}")
+        return ""
+
+
+def _read_raw_text(file_path: str) -> str:
+    """Read a file's contents as UTF-8 text, ignoring undecodable bytes."""
+    logger.info("Falling back to raw text read of file contents")
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read()
+    except Exception as read_error:
+        logger.info(f"Fallback read failed: {read_error}")
+        return ""
+
+
+# Text extraction used when UnstructuredLoader fails, chosen by file extension.
+# Binary formats get a single dedicated extractor instead of also being read
+# as raw text; everything else is read as text.
+_FALLBACK_EXTRACTORS: Dict[str, Callable[[str], str]] = {
+    ".pdf": _extract_pdf_text,
+}
+
+
+class EmbeddingCache:
+    """Thread-safe LRU cache of embeddings with a per-entry TTL.
+
+    Entries are keyed by a 16-byte digest of the text so the cache does not
+    hold on to the raw chunk contents, and vectors are kept as float32 arrays
+    (4 bytes per dimension instead of a boxed Python float each), converted
+    back to lists on read. A ``max_entries`` of 0 disables it.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[bytes, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()[:16]
+
+    def get(self, key: bytes) -> Optional[list[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0].tolist()
+
+    def put(self, key: bytes, embedding: list[float]) -> None:
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = (np.asarray(embedding, dtype=np.float32), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class EmbeddingError(RuntimeError):
+    """Raised when the embedding service cannot produce a valid vector."""
 
 
 class CustomEmbeddings:
     """Wraps qwen3 embedding model to match OpenAI format"""
-    def __init__(self, model: str = "Qwen3-Embedding-4B-Q8_0.gguf", host: str = "http://qwen3-embedding:8000"):
+
+    # Attempts per request; only connection errors, timeouts and 5xx are retried
+    MAX_ATTEMPTS = 2
+    # Base delay in seconds before a retry, jittered up to 2x
+    RETRY_BACKOFF = 0.5
+    # Texts sent per embedding request, and requests kept in flight at once
+    BATCH_SIZE = 16
+    MAX_CONCURRENCY = 4
+
+    def __init__(
+        self,
+        model: str = "Qwen3-Embedding-4B-Q8_0.gguf",
+        host: str = "http://qwen3-embedding:8000",
+        timeout: float = 60.0,
+        cache_size: int = 4096,
+        cache_ttl: float = 3600.0
+    ):
         self.model = model
         self.url = f"{host}/v1/embeddings"
+        self.timeout = timeout
+        self.dim: Optional[int] = None
+        self._cache = EmbeddingCache(max_entries=cache_size, ttl=cache_ttl)
+        # Shared by every single-batch call (e.g. each retrieval's query);
+        # httpx.Client is safe to use from multiple threads
+        self._client = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=self.MAX_CONCURRENCY)
+        )
 
-    def __call__(self, texts: list[str]) -> list[list[float]]:
-        embeddings = []
-        for text in texts:
-            response = requests.post(
-                self.url,
-                json={"input": text, "model": self.model},
-                headers={"Content-Type": "application/json"}
-            )
-            response.raise_for_status()
-            data = response.json()
-            embeddings.append(data["data"][0]["embedding"])
+    def _normalize(self, embedding: list[float]) -> list[float]:
+        if not embedding:
+            raise EmbeddingError("Embedding service returned an empty vector")
+        if self.dim is None:
+            self.dim = len(embedding)
+        elif len(embedding) != self.dim:
+            raise EmbeddingError(f"Embedding dimension changed from {self.dim} to {len(embedding)}")
+
+        # Normalize once at write/query time so inner product equals cosine
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not norm:
+            raise EmbeddingError("Embedding service returned a zero vector")
+        return (vector / norm).tolist()
+
+    def _parse_batch(self, response: httpx.Response, texts: list[str]) -> list[list[float]]:
+        response.raise_for_status()
+        data = sorted(response.json()["data"], key=lambda item: item.get("index", 0))
+        if len(data) != len(texts):
+            raise EmbeddingError(f"Expected {len(texts)} embeddings, got {len(data)}")
+        return [self._normalize(item["embedding"]) for item in data]
+
+    def _should_retry(self, error: Exception, attempt: int) -> bool:
+        client_error = isinstance(error, httpx.HTTPStatusError) and error.response.status_code < 500
+        return not client_error and attempt < self.MAX_ATTEMPTS
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            try:
+                response = self._client.post(self.url, json={"input": texts, "model": self.model})
+                return self._parse_batch(response, texts)
+            except (httpx.HTTPError, KeyError, IndexError, ValueError) as e:
+                if not self._should_retry(e, attempt):
+                    raise EmbeddingError(f"Embedding request failed after {attempt} attempt(s): {e}") from e
+                time.sleep(self.RETRY_BACKOFF * (1 + random.random()))
+
+    async def _aembed_batch(
+        self,
+        client: httpx.AsyncClient,
+        semaphore: asyncio.Semaphore,
+        texts: list[str]
+    ) -> list[list[float]]:
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            try:
+                async with semaphore:
+                    response = await client.post(self.url, json={"input": texts, "model": self.model})
+                return self._parse_batch(response, texts)
+            except (httpx.HTTPError, KeyError, IndexError, ValueError) as e:
+                if not self._should_retry(e, attempt):
+                    raise EmbeddingError(f"Embedding request failed after {attempt} attempt(s): {e}") from e
+                await asyncio.sleep(self.RETRY_BACKOFF * (1 + random.random()))
+
+    async def _aembed_batches(self, batches: list[list[str]]) -> list[list[list[float]]]:
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENCY)
+        limits = httpx.Limits(max_connections=self.MAX_CONCURRENCY)
+        async with httpx.AsyncClient(timeout=self.timeout, limits=limits) as client:
+            return await asyncio.gather(*(
+                self._aembed_batch(client, semaphore, batch) for batch in batches
+            ))
+
+    def _plan(self, texts: list[str]) -> Tuple[list[bytes], list, list[list[int]]]:
+        """Look texts up in the cache and group the misses into request batches."""
+        keys = [self._cache.key(text) for text in texts]
+        embeddings = [self._cache.get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        batches = [
+            missing[start:start + self.BATCH_SIZE]
+            for start in range(0, len(missing), self.BATCH_SIZE)
+        ]
+        return keys, embeddings, batches
+
+    def _fill(self, keys: list[bytes], embeddings: list, batches: list[list[int]], results) -> list[list[float]]:
+        for batch, batch_embeddings in zip(batches, results):
+            for i, embedding in zip(batch, batch_embeddings):
+                embeddings[i] = embedding
+                self._cache.put(keys[i], embedding)
         return embeddings
 
-    
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts in concurrent batched requests, serving repeats from the cache."""
+        keys, embeddings, batches = self._plan(texts)
+        results = await self._aembed_batches([[texts[i] for i in batch] for batch in batches])
+        return self._fill(keys, embeddings, batches, results)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Embed a single query text from async code."""
+        return (await self.aembed_documents([text]))[0]
+
+    def __call__(self, texts: list[str]) -> list[list[float]]:
+        keys, embeddings, batches = self._plan(texts)
+        batch_texts = [[texts[i] for i in batch] for batch in batches]
+        if len(batch_texts) <= 1:
+            # Queries and small documents fit in one request; the long-lived
+            # sync client reuses its pooled connection with no loop setup
+            results = [self._embed_batch(batch) for batch in batch_texts]
+        else:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                results = asyncio.run(self._aembed_batches(batch_texts))
+            else:
+                # Called synchronously from inside a running event loop, which
+                # cannot be re-entered; drive a private loop on a worker thread
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    results = executor.submit(asyncio.run, self._aembed_batches(batch_texts)).result()
+        return self._fill(keys, embeddings, batches, results)
+
     def embed_documents(self, texts: list[str]) -> list[list[float]]:
         """Embed a list of document texts. Required by Milvus library."""
         return self.__call__(texts)
@@ -70,11 +300,31 @@ class VectorStore:
     # Default collection name for all documents
     DEFAULT_COLLECTION_NAME = "context"
 
+    # Upper bound on files parsed concurrently by _load_documents
+    LOAD_MAX_WORKERS = 8
+
+    # Source mapping log entries tolerated before compacting into a snapshot
+    MAPPING_LOG_MIN_ENTRIES = 100
+
+    # Number of chunks embedded and inserted per Milvus insert
+    INDEX_BATCH_SIZE = 256
+
+    # Vector index used when the collection is first created: LangChain's
+    # default AUTOINDEX, with IP instead of L2. Embeddings are unit length,
+    # so IP ranks exactly like cosine without per-query normalization.
+    # Existing collections keep whatever index they were built with; L2 on
+    # unit vectors yields the same ranking.
+    VECTOR_INDEX_PARAMS = {
+        "index_type": "AUTOINDEX",
+        "metric_type": "IP",
+        "params": {}
+    }
+
     def __init__(
         self,
         embeddings=None,
         uri: str = "http://milvus:19530",
-        on_source_deleted: Optional[Callable[[str], None]] = None,
+        on_source_deleted: Optional[Callable[..., None]] = None,
         upload_dir: str = "uploads"
     ):
         """Initialize the vector store.
@@ -82,7 +332,7 @@ class VectorStore:
         Args:
             embeddings: Embedding model to use (defaults to OllamaEmbeddings)
             uri: Milvus connection URI
-            on_source_deleted: Optional callback when a source is deleted
+            on_source_deleted: Optional callback invoked with the deleted source name(s)
             upload_dir: Directory for storing uploaded files
         """
         try:
@@ -94,6 +344,8 @@ class VectorStore:
 
             # Source to task_id mapping for file cleanup
             self._source_to_task_id: Dict[str, str] = {}
+            self._mapping_lock = threading.Lock()
+            self._mapping_log_entries = 0
             self._load_source_mapping()
 
             self.text_splitter = RecursiveCharacterTextSplitter(
@@ -111,38 +363,130 @@ class VectorStore:
             }, exc_info=True)
             raise
 
-    def _load_source_mapping(self) -> None:
-        """Load source to task_id mapping from config file if exists."""
+    @contextmanager
+    def _mapping_file_lock(self, shared: bool = False):
+        """Hold an flock on the mapping lock file across processes.
+
+        The API process and every RAG server process share upload_dir, so the
+        snapshot and log are only read under a shared lock and only changed
+        under an exclusive one.
+        """
+        os.makedirs(self.upload_dir, exist_ok=True)
+        with open(os.path.join(self.upload_dir, "source_mapping.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_source_mapping(self) -> Tuple[Dict[str, str], int]:
+        """Read the snapshot and replay the change log; caller holds the file lock.
+
+        Returns:
+            The mapping and the number of log entries replayed
+        """
+        mapping: Dict[str, str] = {}
         mapping_file = os.path.join(self.upload_dir, "source_mapping.json")
+        log_file = os.path.join(self.upload_dir, "source_mapping.log")
         if os.path.exists(mapping_file):
             try:
                 with open(mapping_file, "r", encoding="utf-8") as f:
-                    self._source_to_task_id = json.load(f)
-                logger.debug({
-                    "message": "Loaded source mapping",
-                    "count": len(self._source_to_task_id)
-                })
+                    mapping = json.load(f)
             except Exception as e:
                 logger.warning({
                     "message": "Failed to load source mapping",
                     "error": str(e)
                 })
-                self._source_to_task_id = {}
 
-    def _save_source_mapping(self) -> None:
-        """Save source to task_id mapping to config file."""
+        replayed = 0
+        if os.path.exists(log_file):
+            with open(log_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn final line from an interrupted append
+                        continue
+                    if entry.get("op") == "set":
+                        mapping[entry["source"]] = entry["task_id"]
+                    elif entry.get("op") == "del":
+                        mapping.pop(entry["source"], None)
+                    replayed += 1
+        return mapping, replayed
+
+    def _load_source_mapping(self) -> None:
+        """Load source to task_id mapping from the snapshot and replay the change log.
+
+        Loading never compacts: stores in read-only processes must not rewrite
+        files the API process is appending to. Compaction happens on append.
+        """
         try:
-            os.makedirs(self.upload_dir, exist_ok=True)
-            mapping_file = os.path.join(self.upload_dir, "source_mapping.json")
-            with open(mapping_file, "w", encoding="utf-8") as f:
-                json.dump(self._source_to_task_id, f, indent=2, ensure_ascii=False)
+            with self._mapping_file_lock(shared=True):
+                self._source_to_task_id, self._mapping_log_entries = self._read_source_mapping()
             logger.debug({
-                "message": "Saved source mapping",
-                "count": len(self._source_to_task_id)
+                "message": "Loaded source mapping",
+                "count": len(self._source_to_task_id),
+                "replayed": self._mapping_log_entries
             })
+        except Exception as e:
+            logger.warning({
+                "message": "Failed to load source mapping",
+                "error": str(e)
+            })
+            self._source_to_task_id = {}
+
+    def _compact_source_mapping(self) -> None:
+        """Fold the change log into the snapshot; caller holds both mapping locks.
+
+        The mapping is re-read from disk rather than taken from memory so
+        changes appended by another process are never dropped.
+        """
+        mapping, _ = self._read_source_mapping()
+        mapping_file = os.path.join(self.upload_dir, "source_mapping.json")
+        # Write to a uniquely named temp file and swap it in so a crash or a
+        # concurrent writer never leaves a truncated mapping behind
+        tmp_file = f"{mapping_file}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(mapping, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_file, mapping_file)
+        except Exception:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+        # Replaying the log over the new snapshot is idempotent, so a crash
+        # before this truncation loses nothing
+        open(os.path.join(self.upload_dir, "source_mapping.log"), "w").close()
+        self._source_to_task_id = mapping
+        self._mapping_log_entries = 0
+        logger.debug({
+            "message": "Saved source mapping",
+            "count": len(mapping)
+        })
+
+    def _append_source_mapping(self, entry: dict) -> None:
+        """Apply one change to the source mapping and append it to the log.
+
+        The in-memory update, the log append and any compaction happen under
+        the thread lock and the cross-process file lock, so concurrent uploads
+        and other processes never see or write a half-applied change.
+        """
+        try:
+            with self._mapping_lock, self._mapping_file_lock():
+                if entry["op"] == "set":
+                    self._source_to_task_id[entry["source"]] = entry["task_id"]
+                else:
+                    self._source_to_task_id.pop(entry["source"], None)
+                with open(os.path.join(self.upload_dir, "source_mapping.log"), "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self._mapping_log_entries += 1
+                if self._mapping_log_entries > max(
+                    self.MAPPING_LOG_MIN_ENTRIES, 10 * len(self._source_to_task_id)
+                ):
+                    self._compact_source_mapping()
         except Exception as e:
             logger.error({
-                "message": "Failed to save source mapping",
+                "message": "Failed to append source mapping change",
                 "error": str(e)
             })
 
@@ -153,8 +497,7 @@ class VectorStore:
             source_name: Original filename/source name
             task_id: UUID of the upload task
         """
-        self._source_to_task_id[source_name] = task_id
-        self._save_source_mapping()
+        self._append_source_mapping({"op": "set", "source": source_name, "task_id": task_id})
         logger.debug({
             "message": "Registered source mapping",
             "source": source_name,
@@ -162,12 +505,19 @@ class VectorStore:
         })
     
     def _initialize_store(self):
+        self._collection = None
         self._store = Milvus(
             embedding_function=self.embeddings,
             collection_name=self.DEFAULT_COLLECTION_NAME,
             connection_args={"uri": self.uri},
+            index_params=self.VECTOR_INDEX_PARAMS,
             auto_id=True
         )
+        # An existing collection gets its source index right away; a new one
+        # gets it once index_documents has created it
+        self._source_index_ready = False
+        if self._store.col is not None:
+            self._ensure_source_index(self._store.col)
         logger.debug({
             "message": "Milvus vector store initialized",
             "uri": self.uri,
@@ -190,101 +540,16 @@ class VectorStore:
                 file_paths = [f for f in file_paths if os.path.isfile(f)]
             
             logger.info(f"Processing {len(file_paths)} files: {file_paths}")
-            
-            for file_path in file_paths:
-                try:
-                    if not source_name:
-                        source_name = os.path.basename(file_path)
-                        logger.info(f"Using filename as source: {source_name}")
-                    
-                    logger.info(f"Loading file: {file_path}")
-                    
-                    file_ext = os.path.splitext(file_path)[1].lower()
-                    logger.info(f"File extension: {file_ext}")
-                    
-                    try:
-                        loader = UnstructuredLoader(file_path)
-                        docs = loader.load()
-                        logger.info(f"Successfully loaded {len(docs)} documents from {file_path}")
-                    except Exception as pdf_error:
-                        logger.error(f'error with unstructured loader, trying to load from scratch')
-                        file_text = None
-                        if file_ext == ".pdf":
-                            logger.info("Attempting PyPDF text extraction fallback")
-                            try:
-                                from pypdf import PdfReader
-                                reader = PdfReader(file_path)
-                                extracted_pages = []
-                                for page in reader.pages:
-                                    try:
-                                        extracted_pages.append(page.extract_text() or "")
-                                    except Exception as per_page_err:
-                                        logger.info(f"Warning: failed to extract a page: {per_page_err}")
-                                        extracted_pages.append("")
-                                file_text = "\n\n".join(extracted_pages).strip()
-                            except Exception as pypdf_error:
-                                logger.info(f"PyPDF fallback failed: {pypdf_error}")
-                                file_text = None
-
-                        if not file_text:
-                            logger.info("Falling back to raw text read of file contents")
-                            try:
-                                with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                                    file_text = f.read()
-                            except Exception as read_error:
-                                logger.info(f"Fallback read failed: {read_error}")
-                                file_text = ""
-
-                        if file_text and file_text.strip():
-                            docs = [Document(
-                                page_content=file_text,
-                                metadata={
-                                    "source": source_name,
-                                    "file_path": file_path,
-                                    "filename": os.path.basename(file_path),
-                                }
-                            )]
-                        else:
-                            logger.info("Creating a simple document as fallback (no text extracted)")
-                            docs = [Document(
-                                page_content=f"Document: {os.path.basename(file_path)}",
-                                metadata={
-                                    "source": source_name,
-                                    "file_path": file_path,
-                                    "filename": os.path.basename(file_path),
-                                }
-                            )]
-                    
-                    for doc in docs:
-                        if not doc.metadata:
-                            doc.metadata = {}
-                        
-                        cleaned_metadata = {}
-                        cleaned_metadata["source"] = source_name
-                        cleaned_metadata["file_path"] = file_path
-                        cleaned_metadata["filename"] = os.path.basename(file_path)
-                        
-                        for key, value in doc.metadata.items():
-                            if key not in ["source", "file_path"]:
-                                if isinstance(value, (list, dict, set)):
-                                    cleaned_metadata[key] = str(value)
-                                elif value is not None:
-                                    cleaned_metadata[key] = str(value)
-                        
-                        doc.metadata = cleaned_metadata
-                    documents.extend(docs)
-                    logger.debug({
-                        "message": "Loaded documents from file",
-                        "file_path": file_path,
-                        "document_count": len(docs)
-                    })
-                except Exception as e:
-                    logger.error({
-                        "message": "Error loading file",
-                        "file_path": file_path,
-                        "error": str(e)
-                    }, exc_info=True)
-                    continue
+
+            if not source_name and file_paths:
+                source_name = os.path.basename(file_paths[0])
+                logger.info(f"Using filename as source: {source_name}")
+
+            if file_paths:
+                max_workers = min(self.LOAD_MAX_WORKERS, len(file_paths))
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    for docs in executor.map(partial(self._load_file, source_name=source_name), file_paths):
+                        documents.extend(docs)
 
             logger.info(f"Total documents loaded: {len(documents)}")
             return documents
@@ -296,6 +561,78 @@ class VectorStore:
             }, exc_info=True)
             raise
 
+    def _load_file(self, file_path: str, source_name: str) -> List[Document]:
+        """Load and clean the documents of a single file.
+
+        Errors are logged and yield an empty list so one bad file does not
+        abort the rest of the batch.
+        """
+        try:
+            logger.info(f"Loading file: {file_path}")
+            
+            file_ext = os.path.splitext(file_path)[1].lower()
+            logger.info(f"File extension: {file_ext}")
+            
+            try:
+                loader = UnstructuredLoader(file_path)
+                docs = loader.load()
+                logger.info(f"Successfully loaded {len(docs)} documents from {file_path}")
+            except Exception as pdf_error:
+                logger.error(f'error with unstructured loader, trying to load from scratch')
+                extract_text = _FALLBACK_EXTRACTORS.get(file_ext, _read_raw_text)
+                file_text = extract_text(file_path)
+
+                if file_text and file_text.strip():
+                    docs = [Document(
+                        page_content=file_text,
+                        metadata={
+                            "source": source_name,
+                            "file_path": file_path,
+                            "filename": os.path.basename(file_path),
+                        }
+                    )]
+                else:
+                    logger.info("Creating a simple document as fallback (no text extracted)")
+                    docs = [Document(
+                        page_content=f"Document: {os.path.basename(file_path)}",
+                        metadata={
+                            "source": source_name,
+                            "file_path": file_path,
+                            "filename": os.path.basename(file_path),
+                        }
+                    )]
+            
+            for doc in docs:
+                if not doc.metadata:
+                    doc.metadata = {}
+                
+                cleaned_metadata = {}
+                cleaned_metadata["source"] = source_name
+                cleaned_metadata["file_path"] = file_path
+                cleaned_metadata["filename"] = os.path.basename(file_path)
+                
+                for key, value in doc.metadata.items():
+                    if key not in ["source", "file_path"]:
+                        if isinstance(value, (list, dict, set)):
+                            cleaned_metadata[key] = str(value)
+                        elif value is not None:
+                            cleaned_metadata[key] = str(value)
+                
+                doc.metadata = cleaned_metadata
+            logger.debug({
+                "message": "Loaded documents from file",
+                "file_path": file_path,
+                "document_count": len(docs)
+            })
+            return docs
+        except Exception as e:
+            logger.error({
+                "message": "Error loading file",
+                "file_path": file_path,
+                "error": str(e)
+            }, exc_info=True)
+            return []
+
     def index_documents(self, documents: List[Document]) -> List[Document]:
         try:
             logger.debug({
@@ -309,7 +646,40 @@ class VectorStore:
                 "chunk_count": len(splits)
             })
             
-            self._store.add_documents(splits)
+            # Embed batch k+1 on a worker thread while batch k is inserted,
+            # bounding peak memory and the size of each insert RPC.
+            batches = [
+                splits[start:start + self.INDEX_BATCH_SIZE]
+                for start in range(0, len(splits), self.INDEX_BATCH_SIZE)
+            ]
+            inserted_pks = []
+            try:
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    pending = executor.submit(self._embed_batch, batches[0]) if batches else None
+                    for i, batch in enumerate(batches):
+                        embeddings = pending.result()
+                        if i + 1 < len(batches):
+                            pending = executor.submit(self._embed_batch, batches[i + 1])
+                        inserted_pks.extend(self._store.add_embeddings(
+                            texts=[doc.page_content for doc in batch],
+                            embeddings=embeddings,
+                            metadatas=[doc.metadata for doc in batch]
+                        ))
+                        logger.debug({
+                            "message": "Inserted chunk batch",
+                            "batch": i + 1,
+                            "batch_count": len(batches),
+                            "chunk_count": len(batch)
+                        })
+            except Exception:
+                # A failed batch must not leave earlier batches behind: the
+                # upload is reported as failed and never becomes a source,
+                # but its chunks would still match unfiltered searches
+                self._rollback_inserts(inserted_pks)
+                raise
+
+            if not self._source_index_ready and self._store.col is not None:
+                self._ensure_source_index(self._store.col)
             self.flush_store()
             
             logger.debug({
@@ -322,18 +692,36 @@ class VectorStore:
             }, exc_info=True)
             raise
 
+    def _rollback_inserts(self, pks: List) -> None:
+        """Delete chunks inserted by an indexing run that failed part way."""
+        if not pks:
+            return
+        try:
+            if not self._store.delete(ids=pks):
+                raise RuntimeError("Milvus delete returned False")
+            logger.info({
+                "message": "Rolled back partially indexed chunks",
+                "chunk_count": len(pks)
+            })
+        except Exception as e:
+            logger.error({
+                "message": "Failed to roll back partially indexed chunks",
+                "chunk_count": len(pks),
+                "error": str(e)
+            })
+
+    def _embed_batch(self, batch: List[Document]) -> List[List[float]]:
+        """Embed the page contents of a batch of chunks."""
+        return self.embeddings.embed_documents([doc.page_content for doc in batch])
+
     def flush_store(self):
         """
         Flush the Milvus collection to ensure that all added documents are persisted to disk.
         """
         try:
-            from pymilvus import connections
-            
-            connections.connect(uri=self.uri)
-            
-
             from pymilvus import utility
-            utility.flush_all()
+
+            utility.flush_all(using=self._store.alias)
             
             logger.debug({
                 "message": "Milvus store flushed (persisted to disk)"
@@ -344,33 +732,57 @@ class VectorStore:
                 "error": str(e)
             }, exc_info=True)
 
+    def _get_collection(self):
+        """Return the cached pymilvus Collection handle, loading it on first use.
+
+        Reuses the connection opened by the LangChain Milvus store instead of
+        reconnecting per call. Returns None if the collection does not exist yet.
+        """
+        if self._collection is None:
+            from pymilvus import Collection, utility
+
+            if not utility.has_collection(self.DEFAULT_COLLECTION_NAME, using=self._store.alias):
+                return None
+            collection = Collection(name=self.DEFAULT_COLLECTION_NAME, using=self._store.alias)
+            self._ensure_source_index(collection)
+            collection.load()
+            self._collection = collection
+        return self._collection
+
+    def _ensure_source_index(self, collection) -> None:
+        """Create an INVERTED scalar index on the source field if it is missing."""
+        if self._source_index_ready:
+            return
+        try:
+            if "source" not in {field.name for field in collection.schema.fields}:
+                return
+            if not any(index.field_name == "source" for index in collection.indexes):
+                collection.create_index("source", {"index_type": "INVERTED"}, index_name="source_index")
+                logger.debug({
+                    "message": "Created INVERTED index on source field"
+                })
+            self._source_index_ready = True
+        except Exception as e:
+            logger.warning({
+                "message": "Failed to create index on source field",
+                "error": str(e)
+            })
 
     def get_documents(self, query: str, k: int = 8, sources: List[str] = None) -> List[Document]:
         """
-        Get relevant documents using the retriever's invoke method.
+        Get relevant documents by vector similarity, optionally filtered by source.
         """
         try:
-            search_kwargs = {"k": k}
-            
+            filter_expr = None
+
             if sources:
-                if len(sources) == 1:
-                    filter_expr = f'source == "{sources[0]}"'
-                else:
-                    source_conditions = [f'source == "{source}"' for source in sources]
-                    filter_expr = " || ".join(source_conditions)
-                
-                search_kwargs["expr"] = filter_expr
+                filter_expr = _source_filter_expr(tuple(sources))
                 logger.debug({
                     "message": "Retrieving with filter",
                     "filter": filter_expr
                 })
             
-            retriever = self._store.as_retriever(
-                search_type="similarity",
-                search_kwargs=search_kwargs
-            )
-            
-            docs = retriever.invoke(query)
+            docs = self._store.similarity_search(query, k=k, expr=filter_expr)
             logger.debug({
                 "message": "Retrieved documents",
                 "query": query,
@@ -397,63 +809,53 @@ class VectorStore:
         Returns:
             bool: True if successful, False otherwise
         """
-        try:
-            from pymilvus import connections, Collection
+        return self.delete_by_sources([source_name])
 
-            connections.connect(uri=self.uri)
+    def delete_by_sources(self, source_names: List[str]) -> bool:
+        """Delete all vectors for several sources from Milvus in one call.
 
-            # Use the default collection (all documents are stored together)
-            collection = Collection(name=self.DEFAULT_COLLECTION_NAME)
+        All sources are removed with a single filtered delete, and the
+        on_source_deleted callback fires once with every name, so bulk
+        cleanup costs one Milvus RPC and one config update.
 
-            # Load collection for reading
-            collection.load()
+        Args:
+            source_names: Names of the sources to delete
 
-            # Build filter expression to delete by source
-            # Escape special characters in source_name for the expression
-            escaped_source = source_name.replace('"', '\\"')
-            filter_expr = f'source == "{escaped_source}"'
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        source_names = list(dict.fromkeys(source_names))
+        if not source_names:
+            return True
+
+        try:
+            # Use the default collection (all documents are stored together)
+            collection = self._get_collection()
 
             logger.debug({
                 "message": "Deleting vectors by source",
-                "source": source_name,
-                "filter": filter_expr
+                "sources": source_names,
+                "filter": _SOURCE_IN_TEMPLATE
             })
 
-            # Delete entities matching the filter
-            # Note: This requires the collection to have a 'source' field indexed
+            # Delete entities matching the filter in a single RPC; the
+            # scalar index on 'source' keeps the match an index lookup.
+            # No explicit flush: deletes are recorded in the WAL. Session
+            # consistency only guarantees read-your-writes for this client, so
+            # searches from the RAG server process may still return the
+            # deleted chunks briefly, until the query nodes consume the delete
             try:
-                # First, check if the field exists and is indexed
-                schema = collection.schema
-                fields = {field.name: field for field in schema.fields}
-
-                if "source" in fields:
-                    # Ensure source field is indexed for filtering
-                    index_info = collection.indexes
-                    has_source_index = any(
-                        "source" in str(idx._index_params.get("field_name", ""))
-                        for idx in index_info
-                    )
-
-                    if not has_source_index:
-                        # Create index on source field if not exists
-                        from pymilvus import Index
-                        index_params = {
-                            "field_name": "source",
-                            "index_type": "STL_SORT",
-                            "metric_type": "INVALID"  # Not used for filtering
-                        }
-                        collection.create_index("source", index_params)
-                        logger.debug({
-                            "message": "Created index on source field for deletion"
-                        })
+                if collection is None:
+                    raise RuntimeError(f"Collection '{self.DEFAULT_COLLECTION_NAME}' does not exist")
 
-                # Delete using the filter
-                delete_result = collection.delete(filter_expr)
-                collection.flush()
+                delete_result = collection.delete(
+                    _SOURCE_IN_TEMPLATE,
+                    expr_params={"sources": source_names}
+                )
 
                 logger.info({
                     "message": "Deleted vectors by source",
-                    "source": source_name,
+                    "sources": source_names,
                     "delete_count": delete_result.delete_count if hasattr(delete_result, 'delete_count') else "unknown"
                 })
 
@@ -466,8 +868,11 @@ class VectorStore:
                 # but we continue to cleanup other resources
 
             # ====== Delete original uploaded files ======
-            if source_name in self._source_to_task_id:
-                task_id = self._source_to_task_id[source_name]
+            for source_name in source_names:
+                task_id = self._source_to_task_id.get(source_name)
+                if task_id is None:
+                    continue
+
                 upload_path = os.path.join(self.upload_dir, task_id)
 
                 if os.path.exists(upload_path):
@@ -485,20 +890,19 @@ class VectorStore:
                         })
 
                 # Remove from mapping
-                del self._source_to_task_id[source_name]
-                self._save_source_mapping()
+                self._append_source_mapping({"op": "del", "source": source_name})
             # ==============================================
 
             # Trigger callback to update config
             if self.on_source_deleted:
-                self.on_source_deleted(source_name)
+                self.on_source_deleted(*source_names)
 
             return True
 
         except Exception as e:
             logger.error({
-                "message": "Error deleting source",
-                "source": source_name,
+                "message": "Error deleting sources",
+                "sources": source_names,
                 "error": str(e)
             }, exc_info=True)
             return False
@@ -530,23 +934,29 @@ def create_vector_store_with_config(config_manager, uri: str = "http://milvus:19
     Returns:
         VectorStore instance with source deletion callback
     """
-    import os
+    def handle_source_deleted(*source_names: str):
+        """Handle source deletion by updating config.
 
-    def handle_source_deleted(source_name: str):
-        """Handle source deletion by updating config."""
+        Accepts any number of sources so a bulk delete costs one config read
+        and at most one write.
+        """
         config = config_manager.read_config()
-        if hasattr(config, 'sources') and source_name in config.sources:
-            config.sources.remove(source_name)
-            # Also remove from selected_sources if present
-            if hasattr(config, 'selected_sources') and source_name in config.selected_sources:
-                config.selected_sources.remove(source_name)
-            config_manager.write_config(config)
+        if not hasattr(config, 'sources'):
+            return
+
+        # Set-backed removal keeps this linear in the number of sources
+        removed = set(source_names).intersection(config.sources)
+        if not removed:
+            return
 
-    # Get upload directory from environment or use default
-    upload_dir = os.getenv("UPLOAD_DIR", "uploads")
+        config.sources = [s for s in config.sources if s not in removed]
+        # Also remove from selected_sources if present
+        if hasattr(config, 'selected_sources'):
+            config.selected_sources = [s for s in config.selected_sources if s not in removed]
+        config_manager.write_config(config)
 
     return VectorStore(
         uri=uri,
         on_source_deleted=handle_source_deleted,
-        upload_dir=upload_dir
+        upload_dir=_UPLOAD_DIR
     )
\ No newline at end of file